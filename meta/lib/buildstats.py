@@ -5,6 +5,7 @@
 # Because it is a real Python module, it can hold persistent state,
 # like open log files and the time of the last sampling.
 
+import os
 import time
 import re
 import bb.event
@@ -159,3 +160,217 @@ class SystemStats:
                               for dev, sample in event.disk_usage.items()]).encode('ascii') +
                      b'\n')
             self.last_disk_monitor = now
+
+def read_cgroup_stats(path):
+    """
+    Read the accounting data of a cgroup v2. Depending on the enabled
+    controllers and the kernel configuration, only some of the values are
+    available. The cumulative counters are returned as integers, the peak
+    memory usage as 'memory.peak'.
+    """
+    def read(name):
+        try:
+            with open(os.path.join(path, name)) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    stats = {}
+    data = read('cpu.stat')
+    for line in (data or '').splitlines():
+        key, value = line.split()[:2]
+        stats['cpu.' + key] = int(value)
+    data = read('memory.peak')
+    if data:
+        stats['memory.peak'] = int(data)
+    data = read('io.stat')
+    if data is not None:
+        stats['io.rbytes'] = 0
+        stats['io.wbytes'] = 0
+        for line in data.splitlines():
+            for field in line.split()[1:]:
+                key, value = field.split('=')
+                if key in ('rbytes', 'wbytes'):
+                    stats['io.' + key] += int(value)
+    for resource in ('cpu', 'io', 'memory'):
+        data = read(resource + '.pressure')
+        for line in (data or '').splitlines():
+            fields = line.split()
+            total = [f for f in fields if f.startswith('total=')]
+            if total:
+                stats['%s.pressure.%s' % (resource, fields[0])] = int(total[0][6:])
+    return stats
+
+def own_cgroup():
+    """Return the path of the cgroup v2 of the current process, if any."""
+    try:
+        with open('/proc/mounts') as f:
+            mounts = [line.split()[1] for line in f if line.split()[2] == 'cgroup2']
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::') and mounts:
+                    return os.path.join(mounts[0], line[3:].strip().lstrip('/'))
+    except (OSError, IndexError):
+        pass
+    return None
+
+class TaskCgroup:
+    """
+    cgroup v2 of a task. All processes started by the task are accounted to
+    it, including those which run via sudo in chroots or schroot sessions and
+    are not waited for by the task process itself.
+    """
+
+    def __init__(self, base, name, leftovers=None):
+        self.base = base
+        self.path = os.path.join(base, name)
+        # the task process returns to its cgroup when the task is done, the
+        # base may have controllers enabled and thus cannot take processes
+        self.origin = own_cgroup() or base
+        self.leftovers = leftovers
+        os.mkdir(self.path)
+        try:
+            self._move(self.path)
+        except OSError:
+            os.rmdir(self.path)
+            raise
+
+    @staticmethod
+    def create(d, name):
+        """
+        Move the task process into a new cgroup below BUILDSTATS_CGROUP or
+        the cgroup of the process. Returns None if this is not permitted.
+        """
+        base = d.getVar('BUILDSTATS_CGROUP') or own_cgroup()
+        if not base or not os.access(os.path.join(base, 'cgroup.procs'), os.W_OK):
+            return None
+        # memory and io accounting need the controllers, which can only be
+        # enabled if the base cgroup holds no processes itself
+        try:
+            with open(os.path.join(base, 'cgroup.subtree_control'), 'w') as f:
+                f.write('+memory +io')
+        except OSError:
+            pass
+        leftovers = None
+        bn = d.getVar('BUILDNAME')
+        if bn:
+            leftovers = os.path.join(d.getVar('BUILDSTATS_BASE'), bn,
+                                     'cgroups.left')
+        try:
+            return TaskCgroup(base, name, leftovers)
+        except OSError:
+            return None
+
+    def _move(self, path):
+        with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+            f.write(str(os.getpid()))
+
+    def stats(self):
+        return read_cgroup_stats(self.path)
+
+    def close(self):
+        """
+        Return the final statistics and remove the cgroup. If processes are
+        left in it, e.g. of schroot sessions, it is recorded for
+        remove_task_cgroups().
+        """
+        stats = self.stats()
+        try:
+            self._move(self.origin)
+        except OSError as e:
+            bb.warn("buildstats: cannot move task out of cgroup %s: %s" %
+                    (self.path, e))
+        try:
+            os.rmdir(self.path)
+        except OSError as e:
+            bb.debug(1, "buildstats: cannot remove cgroup %s yet: %s" %
+                     (self.path, e))
+            if self.leftovers:
+                # single write, tasks append concurrently
+                fd = os.open(self.leftovers,
+                             os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, (self.path + '\n').encode())
+                finally:
+                    os.close(fd)
+        return stats
+
+def remove_task_cgroups(d):
+    """
+    Remove the task cgroups of the build which still held processes when
+    their task was done.
+    """
+    bn = d.getVar('BUILDNAME')
+    if not bn:
+        return
+    leftovers = os.path.join(d.getVar('BUILDSTATS_BASE'), bn, 'cgroups.left')
+    try:
+        with open(leftovers) as f:
+            paths = f.read().split('\n')
+    except FileNotFoundError:
+        return
+    for path in filter(None, paths):
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            bb.warn("buildstats: cannot remove task cgroup %s: %s" % (path, e))
+    os.remove(leftovers)
+
+class StageStats:
+    """
+    Time and resource usage of the stages (shell functions) of a task. The
+    cumulative counters of the task cgroup are used if the task has one,
+    otherwise the resource usage of all waited-for child processes. Every
+    stage is appended as one line to 'stages.log' in the buildstats
+    directory:
+
+    <start> <end> <PF> <task> <stage> <key>=<value> ...
+    """
+
+    def __init__(self, d):
+        self.logfile = None
+        bn = d.getVar('BUILDNAME')
+        if bn:
+            self.logfile = os.path.join(d.getVar('BUILDSTATS_BASE'), bn,
+                                        'stages.log')
+        self.cgroup = d.getVar('_buildstats_task_cgroup', False)
+        self.prefix = '%s do_%s' % (d.getVar('PF'), d.getVar('BB_CURRENTTASK'))
+        self.current = None
+
+    def _sample(self):
+        import resource
+        if self.cgroup:
+            stats = self.cgroup.stats()
+            stats.pop('memory.peak', None)
+            return stats
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {
+            'rusage.utime_usec': int(usage.ru_utime * 1000000),
+            'rusage.stime_usec': int(usage.ru_stime * 1000000),
+            'rusage.inblock': usage.ru_inblock,
+            'rusage.oublock': usage.ru_oublock,
+        }
+
+    def start(self, stage):
+        self.current = (stage, time.time(), self._sample())
+
+    def stop(self):
+        if not self.current:
+            return
+        stage, start, before = self.current
+        self.current = None
+        end = time.time()
+        after = self._sample()
+        if not self.logfile:
+            return
+        fields = ' '.join('%s=%d' % (key, after[key] - before.get(key, 0))
+                          for key in sorted(after))
+        line = '%.2f %.2f %s %s %s\n' % (start, end, self.prefix, stage, fields)
+        # single write, tasks append concurrently
+        fd = os.open(self.logfile, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
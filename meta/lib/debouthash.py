@@ -0,0 +1,185 @@
+#
+# This software is a part of ISAR.
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+#
+# Output hash for hash equivalence which looks into Debian packages. The .deb
+# files produced by do_dpkg_build differ in their ar and tar timestamps even
+# if their content is identical, so hashing them like OEOuthashBasic does
+# never finds equivalent builds. Enable it with
+#
+#   BB_SIGNATURE_HANDLER = "OEEquivHash"
+#   SSTATE_HASHEQUIV_METHOD = "debouthash.IsarOuthashDeb"
+
+import hashlib
+import io
+import os
+import stat
+import subprocess
+import tarfile
+import threading
+
+import bb
+import oe.sstatesig
+
+# Tasks whose output are Debian packages
+DEB_TASKS = ['dpkg_build']
+
+class _ArMember(io.RawIOBase):
+    """The data of an ar archive member, read from the archive file."""
+
+    def __init__(self, archive, size):
+        self.archive = archive
+        self.left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.archive.read(min(len(b), self.left))
+        b[:len(data)] = data
+        self.left -= len(data)
+        return len(data)
+
+def _ar_members(archive):
+    """Iterate over the names and data of the members of an ar archive."""
+    if archive.read(8) != b'!<arch>\n':
+        raise ValueError("not an ar archive")
+    while True:
+        header = archive.read(60)
+        if not header:
+            return
+        if len(header) != 60 or header[58:60] != b'`\n':
+            raise ValueError("invalid ar member header")
+        # timestamp, owner and mode of the member are not hashed
+        name = header[0:16].decode().strip().rstrip('/')
+        size = int(header[48:58])
+        member = _ArMember(archive, size)
+        yield name, io.BufferedReader(member)
+        # skip what was not read and the padding to an even offset
+        archive.read(member.left + size % 2)
+
+def _tar_entries(name, data):
+    """
+    Return the normalized description of each entry of the compressed tar
+    archive 'data', sorted by path. Timestamps are ignored.
+    """
+    compression = name.partition('.tar')[2].lstrip('.')
+    proc = None
+    if compression == 'zst':
+        # no zstd support in tarfile, decompress in a pipe
+        proc = subprocess.Popen(['zstd', '-dcq'], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE)
+
+        def feed():
+            try:
+                for chunk in iter(lambda: data.read(65536), b''):
+                    proc.stdin.write(chunk)
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        tar = tarfile.open(fileobj=proc.stdout, mode='r|')
+    else:
+        tar = tarfile.open(fileobj=data, mode='r|%s' % compression)
+
+    entries = []
+    try:
+        for info in tar:
+            sha = ''
+            if info.isfile():
+                fh = hashlib.sha256()
+                content = tar.extractfile(info)
+                for chunk in iter(lambda: content.read(65536), b''):
+                    fh.update(chunk)
+                sha = fh.hexdigest()
+            path = os.path.normpath(info.name)
+            entries.append((path, '%s %04o %s:%s %d %s %s -> %s %d.%d' % (
+                info.type.decode(), info.mode & 0o7777,
+                info.uname or info.uid, info.gname or info.gid, info.size,
+                sha or '-', path, info.linkname,
+                info.devmajor, info.devminor)))
+    finally:
+        tar.close()
+        if proc:
+            proc.stdout.read()
+            proc.stdout.close()
+            feeder.join()
+            if proc.wait() != 0:
+                raise ValueError("cannot decompress %s" % name)
+    return [entry for _, entry in sorted(entries)]
+
+def _deb_entries(path):
+    """Return the normalized description of the Debian package 'path'."""
+    entries = []
+    with open(path, 'rb') as archive:
+        for name, data in _ar_members(archive):
+            if name.startswith(('control.tar', 'data.tar')):
+                entries += ['%s: %s' % (name.partition('.')[0], entry)
+                            for entry in _tar_entries(name, data)]
+            else:
+                entries.append('%s: %s' % (
+                    name, hashlib.sha256(data.read()).hexdigest()))
+    return entries
+
+def IsarOuthashDeb(path, sigfile, task, d):
+    """
+    Output hash which only depends on the contents of the Debian packages
+    created by 'task', i.e. their members and the contents, modes and owners
+    of the files in them. Other tasks use OEOuthashBasic.
+    """
+    if task not in DEB_TASKS:
+        return oe.sstatesig.OEOuthashBasic(path, sigfile, task, d)
+
+    h = hashlib.sha256()
+
+    def update_hash(s):
+        s = s.encode('utf-8')
+        h.update(s)
+        if sigfile:
+            sigfile.write(s)
+
+    update_hash("IsarOuthashDeb\n")
+    hash_version = d.getVar('HASHEQUIV_HASH_VERSION')
+    if hash_version:
+        update_hash(hash_version + "\n")
+    extra_sigdata = d.getVar("HASHEQUIV_EXTRA_SIGDATA")
+    if extra_sigdata:
+        update_hash(extra_sigdata + "\n")
+    update_hash("SSTATE_PKGSPEC=%s\n" % d.getVar('SSTATE_PKGSPEC'))
+    update_hash("task=%s\n" % task)
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for f in sorted(files):
+            if f == 'fixmepath':
+                continue
+            filepath = os.path.join(root, f)
+            relpath = os.path.relpath(filepath, path)
+            if not stat.S_ISREG(os.lstat(filepath).st_mode):
+                update_hash("%s -> %s\n" % (relpath, os.readlink(filepath))
+                            if os.path.islink(filepath) else "%s\n" % relpath)
+                continue
+
+            if f.endswith('.deb'):
+                try:
+                    entries = _deb_entries(filepath)
+                except (OSError, ValueError, tarfile.TarError) as e:
+                    bb.warn("Cannot read %s, hashing it as a file: %s" % (f, e))
+                else:
+                    update_hash("%s\n" % relpath)
+                    for entry in entries:
+                        update_hash("  %s\n" % entry)
+                    continue
+
+            fh = hashlib.sha256()
+            with open(filepath, 'rb') as content:
+                for chunk in iter(lambda: content.read(65536), b''):
+                    fh.update(chunk)
+            update_hash("%s %s\n" % (relpath, fh.hexdigest()))
+
+    return h.hexdigest()
@@ -0,0 +1,184 @@
+#
+# This software is a part of ISAR.
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+#
+# Snapshots of isar-apt for package builds (see isar_apt_snapshot in
+# dpkg-base.bbclass). A snapshot holds a copy of the dists of a repo state,
+# its pool is bind mounted from a pool store shared by all snapshots:
+#
+#   <snapshots>/<id>/dists         copy of the indices
+#   <snapshots>/<id>/pool          empty, mount point of the pool store
+#   <snapshots>/<id>/.pool-store   link to the pool store
+#   <snapshots>/.pool-<n>          pool store, generation n
+#   <snapshots>/.pool-<n>.json     the files in it and their checksums
+#
+# reprepro removes and adds pool files, it does not modify them. A store
+# therefore keeps hardlinks of the pool files and only grows, so the files
+# of older snapshots stay available. Adding a repo state only links the new
+# files. If reprepro replaced a file by one with the same name and other
+# content, e.g. a package rebuilt with the same version, a new generation
+# is started.
+
+import gzip
+import json
+import os
+import re
+import shutil
+
+import bb.utils
+
+STORE_PREFIX = '.pool-'
+STORE_LINK = '.pool-store'
+
+def _read_index(path):
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read().decode()
+    if os.path.exists(path + '.gz'):
+        with gzip.open(path + '.gz') as f:
+            return f.read().decode()
+    return ''
+
+def _stanzas(data):
+    for stanza in data.split('\n\n'):
+        fields = {}
+        field = None
+        for line in stanza.split('\n'):
+            if line[:1] in (' ', '\t') and field:
+                fields[field] += '\n' + line.strip()
+            elif ':' in line:
+                field, value = line.split(':', 1)
+                fields[field] = value.strip()
+        if fields:
+            yield fields
+
+def pool_files(dists):
+    """
+    Return the pool files referenced by the Packages and Sources indices
+    below 'dists', as a dict of their paths relative to the repo and their
+    SHA256 checksums.
+    """
+    files = {}
+    for root, dirs, names in os.walk(dists):
+        dirs.sort()
+        for name in set(re.sub(r'\.gz$', '', n) for n in names):
+            if name == 'Packages':
+                for fields in _stanzas(_read_index(os.path.join(root, name))):
+                    if 'Filename' in fields:
+                        files[fields['Filename']] = fields.get('SHA256', '')
+            elif name == 'Sources':
+                for fields in _stanzas(_read_index(os.path.join(root, name))):
+                    for line in fields.get('Checksums-Sha256', '').split('\n'):
+                        if len(line.split()) == 3:
+                            sha, _, filename = line.split()
+                            path = os.path.join(fields['Directory'], filename)
+                            files[path] = sha
+    return files
+
+def _generations(snapshots):
+    return sorted(int(name[len(STORE_PREFIX):])
+                  for name in os.listdir(snapshots)
+                  if name.startswith(STORE_PREFIX) and
+                  name[len(STORE_PREFIX):].isdigit())
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def pool_store(repo, snapshots):
+    """
+    Add the pool files of the current state of 'repo' to the current pool
+    store, or to a new one if files were replaced, and return its path.
+    Only new files are linked. The pool of the repo must not change
+    meanwhile, i.e. the isar-apt lock has to be held.
+    """
+    files = pool_files(os.path.join(repo, 'dists'))
+    bb.utils.mkdirhier(snapshots)
+    with bb.utils.fileslocked([os.path.join(snapshots, 'pool.lock')]):
+        generations = _generations(snapshots)
+        generation = generations[-1] if generations else 0
+        store = os.path.join(snapshots, STORE_PREFIX + str(generation))
+        try:
+            with open(store + '.json') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            # not recorded, e.g. interrupted while it was created
+            stored = None
+        if stored is None or any(stored.get(path, sha) != sha
+                                 for path, sha in files.items()):
+            generation += 1
+            store = os.path.join(snapshots, STORE_PREFIX + str(generation))
+            stored = {}
+            bb.utils.mkdirhier(store)
+
+        added = 0
+        for path, sha in sorted(files.items()):
+            if path in stored or not path.startswith('pool/'):
+                continue
+            dst = os.path.join(store, path[len('pool/'):])
+            bb.utils.mkdirhier(os.path.dirname(dst))
+            if os.path.lexists(dst):
+                # left by an interrupted run, no snapshot refers to it
+                os.unlink(dst)
+            _link_or_copy(os.path.join(repo, path), dst)
+            stored[path] = sha
+            added += 1
+
+        if added or not os.path.exists(store + '.json'):
+            with open(store + '.json.new', 'w') as f:
+                json.dump(stored, f)
+            os.rename(store + '.json.new', store + '.json')
+        bb.debug(1, "isar-apt pool store %s: %d files added" % (store, added))
+    return store
+
+def cleanup(snapshots):
+    """
+    Remove all but the latest snapshot and the pool stores it does not use.
+    The files of the remaining store which the latest snapshot does not
+    refer to are removed as well. Only call this when no package build
+    uses the snapshots.
+    """
+    for stale in os.listdir(snapshots):
+        if stale.startswith('.new-'):
+            shutil.rmtree(os.path.join(snapshots, stale), ignore_errors=True)
+    latest = sorted((os.path.join(snapshots, name)
+                     for name in os.listdir(snapshots)
+                     if not name.startswith('.') and
+                     os.path.isdir(os.path.join(snapshots, name))),
+                    key=os.path.getmtime)
+    for snapshot in latest[:-1]:
+        shutil.rmtree(snapshot, ignore_errors=True)
+    latest = latest[-1:]
+
+    used = None
+    if latest and os.path.islink(os.path.join(latest[0], STORE_LINK)):
+        used = os.path.realpath(os.path.join(latest[0], STORE_LINK))
+    for generation in _generations(snapshots):
+        store = os.path.join(snapshots, STORE_PREFIX + str(generation))
+        if store != used:
+            shutil.rmtree(store, ignore_errors=True)
+            if os.path.exists(store + '.json'):
+                os.remove(store + '.json')
+    if not used:
+        return
+
+    files = pool_files(os.path.join(latest[0], 'dists'))
+    try:
+        with open(used + '.json') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return
+    for path in list(stored):
+        if path not in files:
+            try:
+                os.remove(os.path.join(used, path[len('pool/'):]))
+            except OSError:
+                pass
+            del stored[path]
+    with open(used + '.json.new', 'w') as f:
+        json.dump(stored, f)
+    os.rename(used + '.json.new', used + '.json')
@@ -0,0 +1,99 @@
+#
+# This software is a part of ISAR.
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+#
+# Single walk over a rootfs for do_rootfs_finalize. It is run as a script with
+# sudo, so it must not depend on bitbake:
+#
+#   rootfswalk.py [--clamp EPOCH] [--newer STAMP] [--cores DIR] ROOTFS
+#
+# The results are written to stdout as NUL terminated records
+# '<kind> <type> <path>', with the types of find's %y:
+#
+#   clamped  mtime was newer than EPOCH and was set to EPOCH
+#   core     core dump, moved to DIR
+#   newer    regular file newer than STAMP, after clamping
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+
+FILE_TYPES = {
+    stat.S_IFREG: b'f',
+    stat.S_IFDIR: b'd',
+    stat.S_IFLNK: b'l',
+    stat.S_IFBLK: b'b',
+    stat.S_IFCHR: b'c',
+    stat.S_IFIFO: b'p',
+    stat.S_IFSOCK: b's',
+}
+
+def walk(top):
+    """
+    Yield the path and lstat result of 'top' and everything below it,
+    without following symlinks. Directories come after their contents, so
+    changing an entry does not alter a directory mtime which was seen already.
+    """
+    stack = [(top, os.lstat(top), None)]
+    while stack:
+        path, st, entries = stack[-1]
+        if entries is None and stat.S_ISDIR(st.st_mode):
+            with os.scandir(path) as it:
+                entries = list(it)
+            stack[-1] = (path, st, entries)
+        if entries:
+            entry = entries.pop()
+            try:
+                stack.append((entry.path, entry.stat(follow_symlinks=False),
+                              None))
+            except FileNotFoundError:
+                pass
+            continue
+        stack.pop()
+        if entries is not None:
+            # moving an entry out of a directory changes its mtime
+            st = os.lstat(path)
+        yield path, st
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clamp', type=int,
+                        help="set mtimes newer than this epoch to it")
+    parser.add_argument('--newer',
+                        help="report regular files newer than this file")
+    parser.add_argument('--cores', help="move core dumps to this directory")
+    parser.add_argument('rootfs')
+    args = parser.parse_args()
+
+    clamp_ns = args.clamp * 10**9 if args.clamp is not None else None
+    newer_ns = os.stat(args.newer).st_mtime_ns if args.newer else None
+    out = sys.stdout.buffer
+
+    def report(kind, st, path):
+        filetype = FILE_TYPES.get(stat.S_IFMT(st.st_mode), b'?')
+        out.write(b'%s %s %s\0' % (kind, filetype, os.fsencode(path)))
+
+    for path, st in walk(args.rootfs):
+        if (args.cores and not stat.S_ISDIR(st.st_mode) and
+                path.endswith('.core')):
+            shutil.move(path, os.path.join(args.cores, os.path.basename(path)))
+            report(b'core', st, path)
+            continue
+
+        mtime_ns = st.st_mtime_ns
+        if clamp_ns is not None and mtime_ns > clamp_ns:
+            # utimensat on the entry itself, also for symlinks
+            os.utime(path, ns=(clamp_ns, clamp_ns), follow_symlinks=False)
+            mtime_ns = clamp_ns
+            report(b'clamped', st, path)
+
+        if newer_ns is not None and stat.S_ISREG(st.st_mode) and \
+                mtime_ns > newer_ns:
+            report(b'newer', st, path)
+
+if __name__ == '__main__':
+    main()
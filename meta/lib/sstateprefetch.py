@@ -0,0 +1,190 @@
+#
+# This software is a part of ISAR.
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+#
+# Fetching of sstate objects from SSTATE_MIRRORS. mirror_fetch() is used by
+# the setscene tasks. The objects found on the mirrors are prefetched by this
+# module run as a separate process, which start() launches with
+#
+#   sstateprefetch.py --bitbake-lib DIR --server-pid PID --threads N REQUEST
+#
+# REQUEST is a JSON file with the expanded variables of the fetcher datastore
+# and the objects to fetch. It is removed by the process.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def mirror_fetch(sstatefetch, localdata, blocking=True, connection_cache=None):
+    """
+    Fetch the sstate object 'sstatefetch' with its .siginfo (and .sig) from
+    the PREMIRRORS of 'localdata' into SSTATE_DIR. Downloads go to
+    SSTATE_PREFETCH_DIR, where an interrupted download is resumed by the
+    next attempt, and the archive is moved into SSTATE_DIR last. Returns
+    False if another process is fetching the object and 'blocking' is False.
+    """
+    import bb.fetch2
+    import bb.utils
+
+    sstatedir = localdata.getVar('SSTATE_DIR')
+    dldir = localdata.getVar('SSTATE_PREFETCH_DIR')
+    lockfile = os.path.join(dldir, sstatefetch + '.fetchlock')
+    bb.utils.mkdirhier(os.path.dirname(lockfile))
+    lock = bb.utils.lockfile(lockfile, retry=blocking)
+    if not lock:
+        return False
+
+    try:
+        if os.path.exists(os.path.join(sstatedir, sstatefetch)):
+            return True
+
+        mirrors = bb.fetch2.mirror_from_string(localdata.getVar('PREMIRRORS'))
+        localdata.setVar('PREMIRRORS', '')
+        localdata.setVar('FILESPATH', dldir)
+        localdata.setVar('DL_DIR', dldir)
+        localdata.setVar('BB_STRICT_CHECKSUM', 'ignore')
+
+        files = [sstatefetch + '.siginfo']
+        if bb.utils.to_boolean(localdata.getVar("SSTATE_VERIFY_SIG"), False):
+            files.append(sstatefetch + '.sig')
+        files.append(sstatefetch)
+
+        for f in files:
+            # The fetcher would take a partial download without checksums as
+            # complete, so run the fetch method of the mirror URIs directly.
+            # It resumes a partial download (see Wget.download).
+            origud = bb.fetch2.FetchData('file://' + f, localdata)
+            uris, _ = bb.fetch2.build_mirroruris(origud, mirrors, localdata)
+            for uri in uris:
+                try:
+                    fetcher = bb.fetch2.Fetch([uri], localdata, cache=False,
+                                              connection_cache=connection_cache)
+                    fetcher.checkstatus()
+                    ud = fetcher.ud[uri]
+                    ud.setup_localpath(localdata)
+                    ud.method.download(ud, localdata)
+                except bb.fetch2.BBFetchException:
+                    continue
+
+                localpath = ud.localpath
+                dest = os.path.join(sstatedir, f)
+                bb.utils.mkdirhier(os.path.dirname(dest))
+                bb.utils.remove(dest + '.prefetch')
+                if isinstance(ud.method, bb.fetch2.local.Local):
+                    os.symlink(localpath, dest + '.prefetch')
+                else:
+                    # DL_DIR may be on another filesystem, only the rename
+                    # is atomic
+                    shutil.move(localpath, dest + '.prefetch')
+                os.replace(dest + '.prefetch', dest)
+                break
+    finally:
+        bb.utils.unlockfile(lock)
+
+    return True
+
+
+def start(objects, localdata, d):
+    """
+    Start a process which fetches the sstate objects, a list of (size, name)
+    tuples, with the fetcher settings of 'localdata'. It does not wait for
+    the process, which keeps running if needed when bitbake is gone but does
+    not start new downloads then.
+    """
+    import bb
+    import bb.fetch2
+    import bb.utils
+
+    threads = min(int(d.getVar('SSTATE_PREFETCH_THREADS')), len(objects))
+    if threads < 1:
+        return
+
+    data = {}
+    for var in localdata.keys():
+        if localdata.getVarFlag(var, 'func', False):
+            continue
+        try:
+            value = localdata.getVar(var)
+        except Exception:
+            # variables which only expand in a task context
+            continue
+        if isinstance(value, str):
+            data[var] = value
+
+    prefetchdir = localdata.getVar('SSTATE_PREFETCH_DIR')
+    bb.utils.mkdirhier(prefetchdir)
+    fd, request = tempfile.mkstemp(prefix='request-', suffix='.json',
+                                   dir=prefetchdir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'data': data, 'objects': sorted(objects, reverse=True)}, f)
+
+    env = dict(os.environ)
+    env.update(bb.fetch2.get_fetcher_environment(d))
+    # sys.executable of the bitbake server is the bitbake-server script
+    with open(os.path.join(prefetchdir, 'prefetch.log'), 'ab') as log:
+        subprocess.Popen(
+            ['python3', os.path.abspath(__file__),
+             '--bitbake-lib', os.path.dirname(os.path.dirname(bb.__file__)),
+             '--server-pid', str(os.getpid()),
+             '--threads', str(threads),
+             request],
+            cwd=prefetchdir, env=env, stdin=subprocess.DEVNULL, stdout=log,
+            stderr=subprocess.STDOUT, close_fds=True, start_new_session=True)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bitbake-lib', required=True)
+    parser.add_argument('--server-pid', type=int, required=True)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('request')
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.bitbake_lib)
+    import bb.data
+    import bb.fetch2
+    import oe.utils
+
+    with open(args.request) as f:
+        request = json.load(f)
+    os.remove(args.request)
+
+    localdata = bb.data.init()
+    for var, value in request['data'].items():
+        localdata.setVar(var, value)
+
+    def prefetch_init(thread_worker):
+        thread_worker.connection_cache = bb.fetch2.FetchConnectionCache()
+
+    def prefetch_end(thread_worker):
+        thread_worker.connection_cache.close_connections()
+
+    def prefetch(thread_worker, sstatefetch):
+        try:
+            os.kill(args.server_pid, 0)
+        except ProcessLookupError:
+            return
+        mirror_fetch(sstatefetch, bb.data.createCopy(localdata),
+                     blocking=False,
+                     connection_cache=thread_worker.connection_cache)
+
+    pool = oe.utils.ThreadedPool(args.threads, len(request['objects']),
+                                 worker_init=prefetch_init,
+                                 worker_end=prefetch_end,
+                                 name="sstate_prefetch-")
+    for size, sstatefetch in request['objects']:
+        pool.add_task(prefetch, sstatefetch)
+    pool.start()
+    pool.wait_completion()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#
+# This software is a part of ISAR.
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+#
+# Durations of tasks and task functions, recorded across builds. They are
+# used for the progress of multi-stage tasks and by the critical path
+# scheduler, which can be enabled with
+#
+#   BB_SCHEDULERS = "taskdurations.RunQueueSchedulerCriticalPath"
+#   BB_SCHEDULER = "critical-path"
+
+import bb.persist_data
+import bb.runqueue
+
+# weight of a new measurement in the moving average
+NEW_WEIGHT = 0.3
+
+class TaskDurations:
+    """
+    Persistent moving averages of durations in seconds. Each entry is kept
+    per recipe ('<PN>:<name>') and for all recipes ('*:<name>'), the latter
+    is the estimate for recipes which did not run 'name' yet.
+    """
+
+    def __init__(self, d):
+        self.table = bb.persist_data.persist('BB_ISAR_TASK_DURATIONS', d)
+        self.cache = None
+
+    def _load(self):
+        if self.cache is None:
+            self.cache = dict(self.table.items())
+        return self.cache
+
+    def get(self, pn, name, default=None):
+        cache = self._load()
+        value = cache.get('%s:%s' % (pn, name)) or cache.get('*:%s' % name)
+        return float(value) if value else default
+
+    def record(self, pn, name, seconds):
+        for key in ('%s:%s' % (pn, name), '*:%s' % name):
+            old = self.table.get(key)
+            if old:
+                seconds_avg = float(old) * (1 - NEW_WEIGHT) + seconds * NEW_WEIGHT
+            else:
+                seconds_avg = seconds
+            self.table[key] = '%.3f' % seconds_avg
+        self.cache = None
+
+class RunQueueSchedulerCriticalPath(bb.runqueue.RunQueueSchedulerSpeed):
+    """
+    Run the tasks with the longest remaining path to the end of the build
+    first. The length of a path is the sum of the recorded durations of its
+    tasks. Without recorded durations this falls back to the order of the
+    speed scheduler.
+    """
+    name = "critical-path"
+
+    # estimate for tasks that never ran
+    default_duration = 1.0
+
+    def __init__(self, runqueue, rqdata):
+        super().__init__(runqueue, rqdata)
+
+        durations = TaskDurations(runqueue.cfgData)
+        entries = rqdata.runtaskentries
+
+        def duration(tid):
+            (mc, fn, taskname, taskfn) = bb.runqueue.split_tid_mcfn(tid)
+            pn = rqdata.dataCaches[mc].pkg_fn[taskfn]
+            return durations.get(pn, taskname, self.default_duration)
+
+        # walk from the end of the build towards its start
+        cost = {}
+        revdeps_left = {tid: len(entries[tid].revdeps) for tid in entries}
+        ready = [tid for tid, left in revdeps_left.items() if left == 0]
+        while ready:
+            tid = ready.pop()
+            cost[tid] = duration(tid) + max(
+                (cost[revdep] for revdep in entries[tid].revdeps), default=0)
+            for dep in entries[tid].depends:
+                revdeps_left[dep] -= 1
+                if revdeps_left[dep] == 0:
+                    ready.append(dep)
+
+        rank = {tid: i for i, tid in enumerate(self.prio_map)}
+        self.prio_map = sorted(entries,
+                               key=lambda tid: (-cost.get(tid, 0), rank[tid]))
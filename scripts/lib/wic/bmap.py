@@ -0,0 +1,217 @@
+#
+# Copyright (c) Siemens AG, 2026
+#
+# SPDX-License-Identifier: GPL-2.0-only
+#
+
+"""
+This module creates block map (bmap) files for the images assembled by wic.
+The checksums of the ranges copied into the image are computed while the data
+passes through 'sparse_copy', so the image does not have to be read again once
+it is complete. Only the blocks which are not covered completely by a single
+copy, like partition tables or partition boundaries which are not aligned to
+the bmap block size, are read back from the image.
+
+The created files follow the bmap format version 2.0 of bmaptool.
+"""
+
+import hashlib
+import logging
+import os
+
+BMAP_BLOCK_SIZE = 4096
+
+_BMAP_HEADER = """<?xml version="1.0" ?>
+<!-- This file contains the block map for an image file, which is basically
+     a list of useful (mapped) block numbers in the image file. In other words,
+     it lists only those blocks which contain data (boot sector, partition
+     table, file-system metadata, files, directories, extents, etc). These
+     blocks have to be copied to the target device. The other blocks do not
+     contain any useful data and do not have to be copied to the target
+     device. -->
+
+<bmap version="2.0">
+    <!-- Image size in bytes: %s -->
+    <ImageSize> %d </ImageSize>
+
+    <!-- Size of a block in bytes -->
+    <BlockSize> %d </BlockSize>
+
+    <!-- Count of blocks in the image file -->
+    <BlocksCount> %d </BlocksCount>
+
+    <!-- Count of mapped blocks: %s or %.1f%% -->
+    <MappedBlocksCount> %d </MappedBlocksCount>
+
+    <!-- Type of checksum used in this file -->
+    <ChecksumType> sha256 </ChecksumType>
+
+    <!-- The checksum of this bmap file. When it is calculated, the value of
+         the checksum has be zero (all ASCII "0" symbols). -->
+    <BmapFileChecksum> %s </BmapFileChecksum>
+
+    <!-- The block map which consists of elements which may either be a
+         range of blocks or a single block. The 'chksum' attribute
+         is the checksum of this blocks range. -->
+    <BlockMap>
+"""
+
+_BMAP_FOOTER = """    </BlockMap>
+</bmap>
+"""
+
+logger = logging.getLogger('wic')
+
+def _human_size(size):
+    """Return a human readable representation of 'size' bytes."""
+    for unit in ('bytes', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024.0
+    return "%.1f %s" % (size, unit)
+
+class _RangeHash(object):
+    """
+    Checksum of the blocks which are completely inside of one copied range.
+    The data of the whole range is passed to 'update', the bytes in front
+    of and after the complete blocks are ignored.
+    """
+
+    def __init__(self, creator, offset, size):
+        bsize = creator.block_size
+        self._creator = creator
+        self._offset = offset
+        self._size = size
+        self._pos = offset
+        self.first = (offset + bsize - 1) // bsize
+        self.last = (offset + size) // bsize - 1
+        self._begin = self.first * bsize
+        self._end = (self.last + 1) * bsize
+        self._sha = hashlib.sha256()
+
+    def update(self, data):
+        """Add the next chunk of the copied data."""
+        begin = max(self._begin - self._pos, 0)
+        end = min(self._end - self._pos, len(data))
+        if begin < end:
+            self._sha.update(data[begin:end])
+        self._pos += len(data)
+
+    def close(self, copied):
+        """Finish the range after 'copied' bytes were written."""
+        if copied != self._size or self._pos != self._offset + copied:
+            # the data did not arrive as expected, read it from the image
+            self._creator.add_dirty(self._offset, self._size)
+            return
+        self._creator.add_block_range(self.first, self.last,
+                                      self._sha.hexdigest())
+
+class BmapCreator(object):
+    """
+    Collect the mapped block ranges of an image and write its bmap file.
+    """
+
+    def __init__(self, block_size=BMAP_BLOCK_SIZE):
+        self.block_size = block_size
+        self._ranges = []
+        self._dirty = []
+
+    def add_block_range(self, first, last, chksum):
+        """Add the blocks 'first' to 'last' with a known checksum."""
+        self._ranges.append((first, last, chksum))
+
+    def add_dirty(self, offset, size):
+        """Add a byte range whose blocks are read from the final image."""
+        if size > 0:
+            self._dirty.append((offset // self.block_size,
+                                (offset + size - 1) // self.block_size))
+
+    def add_range(self, offset, size):
+        """
+        Add a byte range which is about to be written to the image. Returns
+        an object whose 'update' method takes the written data and whose
+        'close' method has to be called once the range is written.
+        """
+        feed = _RangeHash(self, offset, size)
+        if feed.first > feed.last:
+            self.add_dirty(offset, size)
+            return None
+        self.add_dirty(offset, feed.first * self.block_size - offset)
+        self.add_dirty((feed.last + 1) * self.block_size,
+                       offset + size - (feed.last + 1) * self.block_size)
+        return feed
+
+    @staticmethod
+    def _merge(ranges):
+        """Merge overlapping and adjacent block ranges."""
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        return merged
+
+    def _split_ranges(self):
+        """
+        Return the ranges with known checksums and the merged ranges which
+        have to be read from the image. Known ranges touching the latter are
+        read from the image as well.
+        """
+        known = list(self._ranges)
+        dirty = self._merge(self._dirty)
+        while True:
+            overlapping = [r for r in known
+                           if any(r[0] <= last and first <= r[1]
+                                  for first, last in dirty)]
+            if not overlapping:
+                return known, dirty
+            logger.debug("bmap: %d copied ranges are read from the image",
+                         len(overlapping))
+            known = [r for r in known if r not in overlapping]
+            dirty = self._merge(dirty + [r[:2] for r in overlapping])
+
+    def write(self, image_path, bmap_path):
+        """Write the bmap file 'bmap_path' for the image 'image_path'."""
+        image_size = os.path.getsize(image_path)
+        blocks_cnt = (image_size + self.block_size - 1) // self.block_size
+
+        ranges, dirty = self._split_ranges()
+        with open(image_path, 'rb') as image:
+            for first, last in dirty:
+                last = min(last, blocks_cnt - 1)
+                if first > last:
+                    continue
+                image.seek(first * self.block_size)
+                size = (last + 1 - first) * self.block_size
+                sha = hashlib.sha256()
+                while size > 0:
+                    chunk = image.read(min(size, 1024 * 1024))
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    size -= len(chunk)
+                ranges.append((first, last, sha.hexdigest()))
+        ranges.sort()
+
+        mapped_cnt = sum(last + 1 - first for first, last, _ in ranges)
+        header = _BMAP_HEADER % (_human_size(image_size), image_size,
+                                 self.block_size, blocks_cnt,
+                                 _human_size(mapped_cnt * self.block_size),
+                                 100.0 * mapped_cnt / max(blocks_cnt, 1),
+                                 mapped_cnt, "0" * 64)
+        lines = [header]
+        for first, last, chksum in ranges:
+            blocks = "%d" % first if first == last else "%d-%d" % (first, last)
+            lines.append('        <Range chksum="%s"> %s </Range>\n'
+                         % (chksum, blocks))
+        lines.append(_BMAP_FOOTER)
+        content = "".join(lines)
+
+        chksum = hashlib.sha256(content.encode()).hexdigest()
+        content = content.replace("0" * 64, chksum, 1)
+        with open(bmap_path, 'w') as bmap_file:
+            bmap_file.write(content)
+
+        logger.debug("Wrote bmap file %s: %d of %d blocks mapped",
+                     bmap_path, mapped_cnt, blocks_cnt)
@@ -24,6 +24,7 @@ import array
 import fcntl
 import tempfile
 import logging
+import time
 
 def get_block_size(file_obj):
     """
@@ -454,7 +455,10 @@ class FilemapFiemap(_FilemapBase):
         self._log.debug("FilemapFiemap: get_mapped_ranges(%d,  %d(%d))"
                         % (start, count, start + count - 1))
         iterator = self._do_get_mapped_ranges(start, count)
-        first_prev, last_prev = next(iterator)
+        try:
+            first_prev, last_prev = next(iterator)
+        except StopIteration:
+            return
 
         for first, last in iterator:
             if last_prev == first - 1:
@@ -510,8 +514,128 @@ def filemap(image, log=None):
         except ErrorNotSupp:
             return FilemapNobmap(image, log)
 
+# The FICLONERANGE ioctl and its 'struct file_clone_range' argument
+_FICLONERANGE = 0x4020940d
+_FILE_CLONE_RANGE_FORMAT = "=qQQQ"
+
+# Errors telling that a copy method is not available for the given files
+_COPY_NOTSUPP = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL,
+                 errno.ENOSYS, errno.EBADF, errno.EPERM, errno.ETXTBSY)
+
+# Size of the buffer used when the data has to be copied in user space
+_COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+class _RangeCopier(object):
+    """
+    Copy byte ranges between two files. The kernel is asked to share the
+    blocks (FICLONERANGE) or to copy them (copy_file_range) first, a plain
+    read/write through a reused buffer is the fallback. A method which
+    fails as not supported is not tried again for the following ranges.
+    """
+
+    def __init__(self, src_file, dst_file, block_size, log):
+        self._src = src_file.fileno()
+        self._dst = dst_file.fileno()
+        self._block_size = block_size
+        self._log = log
+        self._clone = True
+        self._copy_file_range = hasattr(os, 'copy_file_range')
+        self._buf = None
+        self.stats = {'clone': 0, 'copy_file_range': 0, 'read/write': 0}
+
+    def _try_clone(self, src_off, dst_off, size):
+        """Share the blocks of a block aligned range, return success."""
+        if src_off % self._block_size or dst_off % self._block_size or \
+           size % self._block_size:
+            return False
+        arg = struct.pack(_FILE_CLONE_RANGE_FORMAT, self._src, src_off,
+                          size, dst_off)
+        try:
+            fcntl.ioctl(self._dst, _FICLONERANGE, arg)
+        except OSError as err:
+            if err.errno not in _COPY_NOTSUPP:
+                raise
+            self._log.debug("sparse_copy: FICLONERANGE not usable: %s" % err)
+            self._clone = False
+            return False
+        self.stats['clone'] += size
+        return True
+
+    def _try_copy_file_range(self, src_off, dst_off, size):
+        """Copy in the kernel, return the number of bytes copied."""
+        copied = 0
+        while copied < size:
+            try:
+                ret = os.copy_file_range(self._src, self._dst, size - copied,
+                                         src_off + copied, dst_off + copied)
+            except OSError as err:
+                if err.errno not in _COPY_NOTSUPP or copied:
+                    raise
+                self._log.debug("sparse_copy: copy_file_range not usable: %s"
+                                % err)
+                self._copy_file_range = False
+                break
+            if ret == 0:
+                # end of the source file
+                break
+            copied += ret
+        self.stats['copy_file_range'] += copied
+        return copied
+
+    def _read(self, src_off, size, dst_off=None, feed=None):
+        """
+        Read through the buffer, passing the data to 'feed' and writing it
+        to the destination unless 'dst_off' is None. Return the number of
+        bytes read.
+        """
+        if self._buf is None:
+            self._buf = memoryview(bytearray(_COPY_BUFFER_SIZE))
+        copied = 0
+        while copied < size:
+            chunk = self._buf[:min(size - copied, _COPY_BUFFER_SIZE)]
+            read = os.preadv(self._src, [chunk], src_off + copied)
+            if read == 0:
+                break
+            if feed:
+                feed.update(chunk[:read])
+            written = 0
+            while dst_off is not None and written < read:
+                written += os.pwrite(self._dst, chunk[written:read],
+                                     dst_off + copied + written)
+            copied += read
+        return copied
+
+    def _read_write(self, src_off, dst_off, size, feed):
+        """Copy through the buffer, return the number of bytes copied."""
+        copied = self._read(src_off, size, dst_off, feed)
+        self.stats['read/write'] += copied
+        return copied
+
+    def copy(self, src_off, dst_off, size, feed=None):
+        """
+        Copy 'size' bytes, return the number of bytes copied. The copied
+        data is passed to the 'update' method of 'feed' if it is given.
+        """
+        copied = 0
+        if self._clone and self._try_clone(src_off, dst_off, size):
+            copied = size
+        elif self._copy_file_range:
+            copied = self._try_copy_file_range(src_off, dst_off, size)
+            if copied != size and not self._copy_file_range:
+                return copied + self._read_write(src_off + copied,
+                                                 dst_off + copied,
+                                                 size - copied, feed)
+        else:
+            return self._read_write(src_off, dst_off, size, feed)
+
+        # data copied by the kernel is read once more from the source,
+        # which is usually still in the page cache
+        if feed and copied:
+            self._read(src_off, copied, feed=feed)
+        return copied
+
 def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
-                length=0, api=None):
+                length=0, api=None, bmap=None):
     """
     Efficiently copy sparse file to or into another file.
 
@@ -521,6 +645,10 @@ def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
     seek: seek N bytes from the start of dst
     length: read N bytes from src and write them to dst
     api: FilemapFiemap or FilemapSeek object
+    bmap: BmapCreator object to pass the copied ranges and data to
+
+    Only the mapped ranges of src are copied. Returns the list of
+    (offset, size) byte ranges written to dst.
     """
     if not api:
         api = filemap
@@ -535,42 +663,39 @@ def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
             dst_size = os.path.getsize(src_fname) + seek - skip
         dst_file.truncate(dst_size)
 
-    written = 0
-    for first, last in fmap.get_mapped_ranges(0, fmap.blocks_cnt):
-        start = first * fmap.block_size
-        end = (last + 1) * fmap.block_size
-
-        if skip >= end:
-            continue
-
-        if start < skip < end:
-            start = skip
-
-        fmap._f_image.seek(start, os.SEEK_SET)
+    src_end = fmap.image_size
+    if length:
+        src_end = min(src_end, skip + length)
 
-        written += start - skip - written
-        if length and written >= length:
-            dst_file.seek(seek + length, os.SEEK_SET)
-            dst_file.close()
-            return
+    copier = _RangeCopier(fmap._f_image, dst_file, fmap.block_size, fmap._log)
+    ranges = []
+    begin = time.monotonic()
+    try:
+        for first, last in fmap.get_mapped_ranges(0, fmap.blocks_cnt):
+            start = max(first * fmap.block_size, skip)
+            end = min((last + 1) * fmap.block_size, src_end)
 
-        dst_file.seek(seek + start - skip, os.SEEK_SET)
-
-        chunk_size = 1024 * 1024
-        to_read = end - start
-        read = 0
-
-        while read < to_read:
-            if read + chunk_size > to_read:
-                chunk_size = to_read - read
-            size = chunk_size
-            if length and written + size > length:
-                size = length - written
-            chunk = fmap._f_image.read(size)
-            dst_file.write(chunk)
-            read += size
-            written += size
-            if written == length:
-                dst_file.close()
-                return
-    dst_file.close()
+            if start >= src_end:
+                break
+            if start >= end:
+                continue
+
+            dst_off = seek + start - skip
+            feed = bmap.add_range(dst_off, end - start) if bmap else None
+            copied = copier.copy(start, dst_off, end - start, feed)
+            if feed:
+                feed.close(copied)
+            if copied:
+                ranges.append((dst_off, copied))
+    finally:
+        dst_file.close()
+
+    elapsed = time.monotonic() - begin
+    total = sum(size for _, size in ranges)
+    fmap._log.debug("sparse_copy: %s -> %s: %d MiB in %.2f s (%.1f MiB/s), "
+                    "%s" % (src_fname, dst_fname, total >> 20, elapsed,
+                            total / (1 << 20) / max(elapsed, 1e-6),
+                            ", ".join("%s %d MiB" % (method, size >> 20)
+                                      for method, size in copier.stats.items()
+                                      if size)))
+    return ranges
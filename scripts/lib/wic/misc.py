@@ -17,6 +17,7 @@ import os
 import re
 import subprocess
 import shutil
+import threading
 
 from collections import defaultdict
 
@@ -188,6 +189,8 @@ class BitbakeVars(defaultdict):
         # default_image and vars_dir attributes should be set from outside
         self.default_image = None
         self.vars_dir = None
+        # partitions may be prepared from several threads
+        self.lock = threading.RLock()
 
     def _parse_line(self, line, image, matcher=re.compile(r"^([a-zA-Z0-9\-_+./~]+)=(.*)")):
         """
@@ -208,6 +211,10 @@ class BitbakeVars(defaultdict):
         This is a lazy method, i.e. it runs bitbake or parses file only when
         only when variable is requested. It also caches results.
         """
+        with self.lock:
+            return self._get_var(var, image, cache)
+
+    def _get_var(self, var, image, cache):
         if not image:
             image = self.default_image
 
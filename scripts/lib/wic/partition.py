@@ -141,7 +141,8 @@ class Partition():
             if self.fstype == "swap":
                 self.prepare_swap_partition(cr_workdir, oe_builddir,
                                             native_sysroot)
-                self.source_file = "%s/fs.%s" % (cr_workdir, self.fstype)
+                self.source_file = "%s/fs.%s.%s" % (cr_workdir, self.lineno,
+                                                    self.fstype)
             else:
                 if self.fstype in ('squashfs', 'erofs'):
                     raise WicError("It's not possible to create empty %s "
@@ -289,7 +290,9 @@ class Partition():
         exec_native_cmd(mkfs_cmd, native_sysroot, pseudo=pseudo)
 
         if self.updated_fstab_path and self.has_fstab and not self.no_fstab_update:
-            debugfs_script_path = os.path.join(cr_workdir, "debugfs_script")
+            # partitions may be prepared in parallel
+            debugfs_script_path = os.path.join(cr_workdir,
+                                               "debugfs_script.%s" % self.lineno)
             with open(debugfs_script_path, "w") as f:
                 f.write("cd etc\n")
                 f.write("rm fstab\n")
@@ -450,7 +453,7 @@ class Partition():
         """
         Prepare a swap partition.
         """
-        path = "%s/fs.%s" % (cr_workdir, self.fstype)
+        path = "%s/fs.%s.%s" % (cr_workdir, self.lineno, self.fstype)
 
         with open(path, 'w') as sparse:
             os.ftruncate(sparse.fileno(), self.size * 1024)
@@ -17,12 +17,14 @@ import shutil
 import tempfile
 import uuid
 
+from concurrent.futures import ThreadPoolExecutor
 from time import strftime
 
 from oe.path import copyhardlinktree
 
 from wic import WicError
-from wic.filemap import sparse_copy
+from wic.bmap import BmapCreator
+from wic.filemap import filemap, sparse_copy
 from wic.ksparser import KickStart, KickStartError
 from wic.pluginbase import PluginMgr, ImagerPlugin
 from wic.misc import get_bitbake_var, exec_cmd, exec_native_cmd
@@ -78,7 +80,7 @@ class DirectPlugin(ImagerPlugin):
         image_path = self._full_path(self.workdir, self.parts[0].disk, "direct")
         self._image = PartitionedImage(image_path, self.ptable_format,
                                        self.parts, self.native_sysroot,
-                                       options.extra_space)
+                                       options.extra_space, self.bmap)
 
     def setup_workdir(self, workdir):
         if workdir:
@@ -209,10 +211,7 @@ class DirectPlugin(ImagerPlugin):
         # Generate .bmap
         if self.bmap:
             logger.debug("Generating bmap file for %s", disk_name)
-            python = os.path.join(self.native_sysroot, 'usr/bin/python3-native/python3')
-            bmaptool = os.path.join(self.native_sysroot, 'usr/bin/bmaptool')
-            exec_native_cmd("%s %s create %s -o %s.bmap" % \
-                            (python, bmaptool, full_path, full_path), self.native_sysroot)
+            self._image.write_bmap(full_path + '.bmap')
         # Compress the image
         if self.compressor:
             logger.debug("Compressing disk %s with %s", disk_name, self.compressor)
@@ -292,12 +291,17 @@ GPT_OVERHEAD = 34
 # Size of a sector in bytes
 SECTOR_SIZE = 512
 
+# Source plugins that only write files named after their partition and can
+# be prepared in parallel. None stands for partitions without --source.
+PARALLEL_SOURCES = (None, 'rootfs', 'rawcopy', 'empty')
+
 class PartitionedImage():
     """
     Partitioned image in a file.
     """
 
-    def __init__(self, path, ptable_format, partitions, native_sysroot=None, extra_space=0):
+    def __init__(self, path, ptable_format, partitions, native_sysroot=None,
+                 extra_space=0, bmap=False):
         self.path = path  # Path to the image file
         self.numpart = 0  # Number of allocated partitions
         self.realpart = 0 # Number of partitions in the partition table
@@ -319,6 +323,8 @@ class PartitionedImage():
         self.native_sysroot = native_sysroot
         num_real_partitions = len([p for p in self.partitions if not p.no_table])
         self.extra_space = extra_space
+        # Block map of the data written by assemble
+        self.bmap = BmapCreator() if bmap else None
 
         # calculate the real partition number, accounting for partitions not
         # in the partition table and logical partitions
@@ -353,18 +359,48 @@ class PartitionedImage():
                     else:
                         part.fsuuid = '0x' + part.fsuuid.upper().rjust(8,"0")
 
+    def _prepare_partition(self, imager, part):
+        # need to create the filesystems in order to get their
+        # sizes before we can add them and do the layout.
+        part.prepare(imager, imager.workdir, imager.oe_builddir,
+                     imager.rootfs_dir, imager.bootimg_dir,
+                     imager.kernel_dir, imager.native_sysroot,
+                     imager.updated_fstab_path)
+
+        # Converting kB to sectors for parted
+        part.size_sec = part.disk_size * 1024 // self.sector_size
+
     def prepare(self, imager):
-        """Prepare an image. Call prepare method of all image partitions."""
+        """
+        Prepare an image. Call prepare method of all image partitions.
+
+        Partitions created without a source plugin or by a plugin that
+        only works on per-partition files are prepared in parallel.
+        Other plugins share directories in the workdir (e.g. hdd/boot)
+        and are run one after the other.
+        """
+        # load the plugins before the worker threads look them up
+        PluginMgr.get_plugins('source')
+
+        parallel = [part for part in self.partitions
+                    if part.source in PARALLEL_SOURCES]
         for part in self.partitions:
-            # need to create the filesystems in order to get their
-            # sizes before we can add them and do the layout.
-            part.prepare(imager, imager.workdir, imager.oe_builddir,
-                         imager.rootfs_dir, imager.bootimg_dir,
-                         imager.kernel_dir, imager.native_sysroot,
-                         imager.updated_fstab_path)
+            if part not in parallel:
+                self._prepare_partition(imager, part)
 
-            # Converting kB to sectors for parted
-            part.size_sec = part.disk_size * 1024 // self.sector_size
+        jobs = min(len(parallel), os.cpu_count() or 1)
+        if jobs < 2:
+            for part in parallel:
+                self._prepare_partition(imager, part)
+            return
+
+        logger.debug("Preparing %d partitions with %d jobs",
+                     len(parallel), jobs)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(self._prepare_partition, imager, part)
+                       for part in parallel]
+            for future in futures:
+                future.result()
 
     def layout_partitions(self):
         """ Layout the partitions, meaning calculate the position of every
@@ -490,20 +526,20 @@ class PartitionedImage():
         self.min_size *= self.sector_size
         self.min_size += self.extra_space
 
-    def _create_partition(self, device, parttype, fstype, start, size):
-        """ Create a partition on an image described by the 'device' object. """
+    def _mkpart_cmd(self, parttype, fstype, start, size):
+        """ Return the parted command creating a partition. """
 
         # Start is included to the size so we need to substract one from the end.
         end = start + size - 1
         logger.debug("Added '%s' partition, sectors %d-%d, size %d sectors",
                      parttype, start, end, size)
 
-        cmd = "parted -s %s unit s mkpart %s" % (device, parttype)
+        cmd = "mkpart %s" % parttype
         if fstype:
             cmd += " %s" % fstype
         cmd += " %d %d" % (start, end)
 
-        return exec_native_cmd(cmd, self.native_sysroot)
+        return cmd
 
     def create(self):
         logger.debug("Creating sparse file %s", self.path)
@@ -521,6 +557,11 @@ class PartitionedImage():
 
         logger.debug("Creating partitions")
 
+        # Partition table changes are collected per tool and applied
+        # with one invocation each.
+        parted_cmds = []
+        sgdisk_opts = []
+        sfdisk_cmds = []
         for part in self.partitions:
             if part.num == 0:
                 continue
@@ -537,9 +578,9 @@ class PartitionedImage():
                 # starts a sector before the first logical partition,
                 # add a sector at the back, so that there is enough
                 # room for all logical partitions.
-                self._create_partition(self.path, "extended",
-                                       None, part.start - 2,
-                                       self.extended_size_sec)
+                parted_cmds.append(self._mkpart_cmd("extended", None,
+                                                    part.start - 2,
+                                                    self.extended_size_sec))
 
             if part.fstype == "swap":
                 parted_fs_type = "linux-swap"
@@ -562,48 +603,53 @@ class PartitionedImage():
                              part.mountpoint)
                 part.size_sec -= 1
 
-            self._create_partition(self.path, part.type,
-                                   parted_fs_type, part.start, part.size_sec)
+            parted_cmds.append(self._mkpart_cmd(part.type, parted_fs_type,
+                                                part.start, part.size_sec))
 
-            if part.part_name:
+            # --label sets the GPT name as well and takes precedence
+            if part.part_name and not \
+               (part.label and self.ptable_format == "gpt"):
                 logger.debug("partition %d: set name to %s",
                              part.num, part.part_name)
-                exec_native_cmd("sgdisk --change-name=%d:%s %s" % \
-                                         (part.num, part.part_name,
-                                          self.path), self.native_sysroot)
+                sgdisk_opts.append("--change-name=%d:%s" % \
+                                   (part.num, part.part_name))
 
             if part.part_type:
                 logger.debug("partition %d: set type UID to %s",
                              part.num, part.part_type)
-                exec_native_cmd("sgdisk --typecode=%d:%s %s" % \
-                                         (part.num, part.part_type,
-                                          self.path), self.native_sysroot)
+                sgdisk_opts.append("--typecode=%d:%s" % \
+                                   (part.num, part.part_type))
 
             if part.uuid and self.ptable_format == "gpt":
                 logger.debug("partition %d: set UUID to %s",
                              part.num, part.uuid)
-                exec_native_cmd("sgdisk --partition-guid=%d:%s %s" % \
-                                (part.num, part.uuid, self.path),
-                                self.native_sysroot)
+                sgdisk_opts.append("--partition-guid=%d:%s" % \
+                                   (part.num, part.uuid))
 
             if part.label and self.ptable_format == "gpt":
                 logger.debug("partition %d: set name to %s",
                              part.num, part.label)
-                exec_native_cmd("parted -s %s name %d %s" % \
-                                (self.path, part.num, part.label),
-                                self.native_sysroot)
+                parted_cmds.append("name %d %s" % (part.num, part.label))
 
             if part.active:
                 flag_name = "legacy_boot" if self.ptable_format == 'gpt' else "boot"
                 logger.debug("Set '%s' flag for partition '%s' on disk '%s'",
                              flag_name, part.num, self.path)
-                exec_native_cmd("parted -s %s set %d %s on" % \
-                                (self.path, part.num, flag_name),
-                                self.native_sysroot)
+                parted_cmds.append("set %d %s on" % (part.num, flag_name))
             if part.system_id:
-                exec_native_cmd("sfdisk --part-type %s %s %s" % \
-                                (self.path, part.num, part.system_id),
-                                self.native_sysroot)
+                sfdisk_cmds.append("sfdisk --part-type %s %s %s" % \
+                                   (self.path, part.num, part.system_id))
+
+        if parted_cmds:
+            exec_native_cmd("parted -s %s unit s %s" % \
+                            (self.path, " ".join(parted_cmds)),
+                            self.native_sysroot)
+        if sgdisk_opts:
+            exec_native_cmd("sgdisk %s %s" % \
+                            (" ".join(sgdisk_opts), self.path),
+                            self.native_sysroot)
+        for cmd in sfdisk_cmds:
+            exec_native_cmd(cmd, self.native_sysroot)
 
     def cleanup(self):
         pass
@@ -615,7 +661,8 @@ class PartitionedImage():
             source = part.source_file
             if source:
                 # install source_file contents into a partition
-                sparse_copy(source, self.path, seek=part.start * self.sector_size)
+                sparse_copy(source, self.path, seek=part.start * self.sector_size,
+                            bmap=self.bmap)
 
                 logger.debug("Installed %s in partition %d, sectors %d-%d, "
                              "size %d sectors", source, part.num, part.start,
@@ -624,3 +671,34 @@ class PartitionedImage():
                 partimage = self.path + '.p%d' % part.num
                 os.rename(source, partimage)
                 self.partimages.append(partimage)
+
+    def write_bmap(self, bmap_path):
+        """
+        Write the block map of the image. The partition contents were
+        recorded while they were copied. Everything else written to the
+        image, like partition tables and boot loaders, is located with the
+        file mapping of the image outside of the partitions.
+        """
+        size = os.path.getsize(self.path)
+        areas = sorted((part.start * self.sector_size,
+                        (part.start + part.size_sec) * self.sector_size)
+                       for part in self.partitions if part.source_file)
+        gaps = []
+        offset = 0
+        for start, end in areas + [(size, size)]:
+            if start > offset:
+                gaps.append((offset, min(start, size)))
+            offset = max(offset, end)
+
+        fmap = filemap(self.path)
+        for start, end in gaps:
+            first = start // fmap.block_size
+            count = min(-(-end // fmap.block_size), fmap.blocks_cnt) - first
+            if count <= 0:
+                continue
+            for mfirst, mlast in fmap.get_mapped_ranges(first, count):
+                mstart = max(mfirst * fmap.block_size, start)
+                mend = min((mlast + 1) * fmap.block_size, end)
+                self.bmap.add_dirty(mstart, mend - mstart)
+
+        self.bmap.write(self.path, bmap_path)
@@ -79,7 +79,7 @@ class RawCopyPlugin(SourcePlugin):
 
         if 'unpack' in source_params:
             img = os.path.join(kernel_dir, source_params['file'])
-            src = os.path.join(cr_workdir, os.path.splitext(source_params['file'])[0])
+            src = os.path.join(cr_workdir, "%s.%s" % (os.path.splitext(source_params['file'])[0], part.lineno))
             RawCopyPlugin.do_image_uncompression(img, src, cr_workdir)
         else:
             src = os.path.join(kernel_dir, source_params['file'])
@@ -705,6 +705,16 @@ def _parse_bitbake_buildstats(writer, state, filename, file):
     if start and end:
         state.add_process(pn + ":" + task, start, end)
 
+def _parse_bitbake_stages(writer, state, file):
+    # <start> <end> <PF> <task> <stage> <key>=<value> ...
+    for line in file:
+        tokens = line.split()
+        if len(tokens) < 5:
+            continue
+        pn = tokens[2]
+        state.add_process("%s:%s:%s" % (pn, tokens[3], tokens[4]),
+                          int(float(tokens[0])), int(float(tokens[1])))
+
 def get_num_cpus(headers):
     """Get the number of CPUs from the system.cpu header property. As the
     CPU utilization graphs are relative, the number of CPUs currently makes
@@ -741,6 +751,8 @@ def _do_parse(writer, state, filename, file):
         state.cmdline = _parse_cmdline_log(writer, file)
     elif name == "monitor_disk.log":
         state.monitor_disk = _parse_monitor_disk_log(file)
+    elif name == "stages.log":
+        _parse_bitbake_stages(writer, state, file)
     elif not filename.endswith('.log'):
         _parse_bitbake_buildstats(writer, state, filename, file)
     t2 = time.process_time()
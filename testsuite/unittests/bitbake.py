@@ -28,6 +28,8 @@ def load_function(file_name: str, function_name: str) -> Callable:
         Callable: The loaded function.
     """
     d = init()
+    # classes may inherit other classes of the core layer
+    d.setVar("BBPATH", "{}/../../meta".format(location))
     parse = handle("{}/../../{}".format(location, file_name), d)
     if function_name not in parse:
         raise KeyError("Function {} does not exist in {}".format(
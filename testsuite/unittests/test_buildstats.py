@@ -0,0 +1,83 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+from bitbake import DataSmart
+
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+location = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, "{}/../../meta/lib".format(location))
+
+import buildstats
+
+
+class TestTaskCgroup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmpdir.name, "base")
+        self.origin = os.path.join(self.tmpdir.name, "origin")
+        os.mkdir(self.base)
+        os.mkdir(self.origin)
+        self.d = DataSmart()
+        self.d.setVar("BUILDNAME", "build")
+        self.d.setVar("BUILDSTATS_BASE", self.tmpdir.name)
+        os.mkdir(os.path.join(self.tmpdir.name, "build"))
+        self.moves = []
+        patcher = patch.object(buildstats.TaskCgroup, "_move",
+                               lambda cg, path: self.moves.append(path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(buildstats, "own_cgroup",
+                               return_value=self.origin)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def create(self) -> buildstats.TaskCgroup:
+        self.d.setVar("BUILDSTATS_CGROUP", self.base)
+        with open(os.path.join(self.base, "cgroup.procs"), "w"):
+            pass
+        return buildstats.TaskCgroup.create(self.d, "task")
+
+    def test_close(self):
+        cgroup = self.create()
+        cgroup.close()
+        # the task returns to its own cgroup, not to the base
+        self.assertEqual(self.moves, [cgroup.path, self.origin])
+        self.assertFalse(os.path.exists(cgroup.path))
+        buildstats.remove_task_cgroups(self.d)
+
+    def test_leftover(self):
+        cgroup = self.create()
+        # files keep the directory, like processes keep a cgroup
+        with open(os.path.join(cgroup.path, "cgroup.procs"), "w"):
+            pass
+        with patch.object(buildstats.bb, "debug"):
+            cgroup.close()
+        self.assertTrue(os.path.exists(cgroup.path))
+
+        with patch.object(buildstats.bb, "warn") as warn:
+            buildstats.remove_task_cgroups(self.d)
+        warn.assert_called_once()
+        self.assertIn(cgroup.path, warn.call_args[0][0])
+
+        os.remove(os.path.join(cgroup.path, "cgroup.procs"))
+        with open(cgroup.leftovers, "w") as f:
+            f.write(cgroup.path + "\n")
+        buildstats.remove_task_cgroups(self.d)
+        self.assertFalse(os.path.exists(cgroup.path))
+        self.assertFalse(os.path.exists(cgroup.leftovers))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+from bitbake import DataSmart
+from rootfs import TemporaryRootfs
+
+import io
+import pathlib
+import shutil
+import subprocess
+import sys
+import tarfile
+import unittest
+from unittest.mock import patch
+
+location = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, "{}/../../meta/lib".format(location))
+
+import debouthash
+
+
+def tar_archive(members, compression, mtime):
+    data = io.BytesIO()
+    mode = "w:" + compression if compression != "zst" else "w"
+    with tarfile.open(fileobj=data, mode=mode) as tar:
+        for name, content, filemode in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mode = filemode
+            info.mtime = mtime
+            tar.addfile(info, io.BytesIO(content))
+    if compression == "zst":
+        return subprocess.run(["zstd", "-cq"], input=data.getvalue(),
+                              stdout=subprocess.PIPE, check=True).stdout
+    return data.getvalue()
+
+
+def ar_archive(members, mtime):
+    data = b"!<arch>\n"
+    for name, content in members:
+        data += "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(
+            name, mtime, 0, 0, 100644, len(content)).encode()
+        data += content + (b"\n" if len(content) % 2 else b"")
+    return data
+
+
+class TestIsarOuthashDeb(unittest.TestCase):
+
+    def outhash(self, mtime=1000, content=b"hello", mode=0o755,
+                compression="xz") -> str:
+        suffix = "." + compression
+        deb = ar_archive([
+            ("debian-binary", b"2.0\n"),
+            ("control.tar" + suffix, tar_archive(
+                [("./control", b"Package: hello\n", 0o644)],
+                compression, mtime)),
+            ("data.tar" + suffix, tar_archive(
+                [("./usr/bin/hello", content, mode)], compression, mtime)),
+        ], mtime)
+
+        deploy = TemporaryRootfs()
+        with open(deploy.path() + "/hello_1.0_arm64.deb", "wb") as f:
+            f.write(deb)
+        deploy.create_file("/hello.buildinfo", "Source: hello\n")
+
+        d = DataSmart()
+        d.setVar("SSTATE_PKGSPEC", "sstate:hello:")
+        return debouthash.IsarOuthashDeb(deploy.path(), None, "dpkg_build",
+                                         d)
+
+    def test_timestamps_ignored(self):
+        self.assertEqual(self.outhash(mtime=1000), self.outhash(mtime=2000))
+
+    def test_content_changes_hash(self):
+        self.assertNotEqual(self.outhash(), self.outhash(content=b"world"))
+
+    def test_mode_changes_hash(self):
+        self.assertNotEqual(self.outhash(), self.outhash(mode=0o644))
+
+    def test_gzip(self):
+        self.assertEqual(self.outhash(mtime=1000, compression="gz"),
+                         self.outhash(mtime=2000, compression="gz"))
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd not installed")
+    def test_zstd(self):
+        self.assertEqual(self.outhash(mtime=1000, compression="zst"),
+                         self.outhash(mtime=2000, compression="zst"))
+        self.assertNotEqual(self.outhash(compression="zst"),
+                            self.outhash(content=b"world", compression="zst"))
+
+    def test_other_tasks(self):
+        d = DataSmart()
+        with patch.object(debouthash.oe.sstatesig, "OEOuthashBasic",
+                          return_value="basic") as basic:
+            self.assertEqual(debouthash.IsarOuthashDeb("/path", None,
+                                                       "deploy", d), "basic")
+        basic.assert_called_once_with("/path", None, "deploy", d)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+from bitbake import load_function, DataSmart
+from rootfs import TemporaryRootfs
+
+import unittest
+
+
+file_name = "meta/classes/dpkg-base.bbclass"
+dpkg_builddeps_isarapt = load_function(file_name, "dpkg_builddeps_isarapt")
+
+PACKAGES = """Package: libfoo-dev
+Version: 1.0
+Architecture: arm64
+Depends: libfoo1 (= 1.0),
+ libbar1
+SHA256: {foo_dev}
+
+Package: libfoo1
+Version: 1.0
+Architecture: arm64
+Pre-Depends: libc6
+SHA256: {foo}
+
+Package: libbar1
+Version: 2.0
+Architecture: arm64
+Provides: libbar-abi-2
+SHA256: {bar}
+
+Package: unrelated
+Version: 3.0
+Architecture: arm64
+SHA256: {unrelated}
+"""
+
+
+class TestDpkgBuilddepsIsarapt(unittest.TestCase):
+
+    def setup(self, **sha256) -> DataSmart:
+        repo = TemporaryRootfs()
+        hashes = dict(foo_dev="a", foo="b", bar="c", unrelated="d")
+        hashes.update(sha256)
+        repo.create_file("/dists/bookworm/main/binary-arm64/Packages",
+                         PACKAGES.format(**hashes))
+        repo.create_file("/dists/bookworm/Release", "")
+
+        d = DataSmart()
+        d.setVar("ISAR_APT_LOCAL_DIR", repo.path())
+        d.setVar("PACKAGE_ARCH", "arm64")
+        d.setVar("BUILD_ARCH", "arm64")
+        return d
+
+    def test_dependency_closure(self):
+        d = self.setup()
+        entries = dpkg_builddeps_isarapt(
+            "debhelper-compat (= 13), libfoo-dev [arm64] <!nocheck>", d)
+        self.assertEqual(entries, ["libbar1 2.0 c", "libfoo-dev 1.0 a",
+                                   "libfoo1 1.0 b"])
+
+    def test_rebuilt_dependency_changes_entries(self):
+        before = dpkg_builddeps_isarapt("libfoo-dev", self.setup())
+        after = dpkg_builddeps_isarapt("libfoo-dev", self.setup(foo="e"))
+        self.assertNotEqual(before, after)
+
+    def test_unrelated_package_keeps_entries(self):
+        before = dpkg_builddeps_isarapt("libfoo-dev", self.setup())
+        after = dpkg_builddeps_isarapt("libfoo-dev",
+                                       self.setup(unrelated="e"))
+        self.assertEqual(before, after)
+
+    def test_provides_and_alternatives(self):
+        d = self.setup()
+        self.assertEqual(dpkg_builddeps_isarapt("libc6-dev | libbar-abi-2", d),
+                         ["libbar1 2.0 c"])
+
+    def test_no_isar_apt(self):
+        d = DataSmart()
+        d.setVar("ISAR_APT_LOCAL_DIR", "/nonexistent")
+        self.assertEqual(dpkg_builddeps_isarapt("libfoo-dev", d), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+import contextlib
+import importlib.machinery
+import importlib.util
+import io
+import os
+import pathlib
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+location = pathlib.Path(__file__).parent.resolve()
+loader = importlib.machinery.SourceFileLoader(
+    "isar_deb_dl_dir", "{}/../../scripts/isar-deb-dl-dir".format(location))
+spec = importlib.util.spec_from_loader(loader.name, loader)
+isar_deb_dl_dir = importlib.util.module_from_spec(spec)
+loader.exec_module(isar_deb_dl_dir)
+
+CONTROL = b"""Package: hello
+Source: hello-src (1.0-1)
+Version: 1.0-1+b1
+Architecture: arm64
+Description: test package
+ with a continuation line: which is not a field
+"""
+
+
+def tar_archive(members, compression):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:" + compression) as tar:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return data.getvalue()
+
+
+def ar_archive(members):
+    data = b"!<arch>\n"
+    for name, content in members:
+        data += "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(
+            name, 0, 0, 0, 100644, len(content)).encode()
+        data += content + (b"\n" if len(content) % 2 else b"")
+    return data
+
+
+class DebTestCase(unittest.TestCase):
+
+    def write_deb(self, control_name, compression="gz"):
+        suffix = ".gz" if compression == "gz" else ".xz"
+        members = [
+            ("debian-binary", b"2.0\n"),
+            ("control.tar" + suffix, tar_archive(
+                [("./md5sums", b""), (control_name, CONTROL)], compression)),
+            ("data.tar" + suffix, tar_archive([], compression)),
+        ]
+        fd, path = tempfile.mkstemp(suffix=".deb")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(ar_archive(members))
+        return path
+
+
+class TestReadDebControl(DebTestCase):
+
+    def test_control_with_dot_prefix(self):
+        fields = isar_deb_dl_dir.read_deb_control(self.write_deb("./control"))
+        self.assertEqual(fields["Package"], "hello")
+        self.assertEqual(fields["Architecture"], "arm64")
+        self.assertNotIn(" with a continuation line", fields)
+
+    def test_control_without_dot_prefix(self):
+        fields = isar_deb_dl_dir.read_deb_control(self.write_deb("control"))
+        self.assertEqual(fields["Package"], "hello")
+        self.assertEqual(fields["Version"], "1.0-1+b1")
+
+    def test_xz_control_archive(self):
+        fields = isar_deb_dl_dir.read_deb_control(
+            self.write_deb("control", compression="xz"))
+        self.assertEqual(fields["Package"], "hello")
+
+    def test_missing_control(self):
+        with self.assertRaises(ValueError):
+            isar_deb_dl_dir.read_deb_control(self.write_deb("./other"))
+
+    def test_metadata_source_version(self):
+        metadata = isar_deb_dl_dir.deb_metadata(self.write_deb("control"))
+        self.assertEqual(metadata["source"], "hello-src")
+        self.assertEqual(metadata["source_version"], "1.0-1")
+        self.assertEqual(metadata["version"], "1.0-1+b1")
+
+
+class TestRepoDiff(DebTestCase):
+
+    def setup(self, repo_dir, content=None):
+        deb = self.write_deb("control")
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        cache = os.path.join(base, "debian-bookworm")
+        repo = os.path.join(base, "base-apt")
+        os.makedirs(cache)
+        name = "hello_1.0-1+b1_arm64.deb"
+        shutil.copy(deb, os.path.join(cache, name))
+        if repo_dir:
+            pool = os.path.join(repo, "pool", "main", repo_dir)
+            os.makedirs(pool)
+            if content is None:
+                shutil.copy(deb, os.path.join(pool, name))
+            else:
+                with open(os.path.join(pool, name), "wb") as f:
+                    f.write(content)
+        return cache, repo
+
+    def repo_diff(self, cache, repo):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            isar_deb_dl_dir.deb_repo_diff(cache, repo)
+        return [line.split()[0] for line in out.getvalue().splitlines()]
+
+    def test_in_pool_path(self):
+        self.assertEqual(self.repo_diff(*self.setup("h/hello-src")), [])
+
+    def test_in_other_pool_dir(self):
+        self.assertEqual(self.repo_diff(*self.setup("h/hello")), [])
+
+    def test_differs_in_other_pool_dir(self):
+        self.assertEqual(self.repo_diff(*self.setup("h/hello", b"other")),
+                         ["replace"])
+
+    def test_missing(self):
+        self.assertEqual(self.repo_diff(*self.setup(None)), ["add"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+import gzip
+import hashlib
+import os
+import pathlib
+import re
+import subprocess
+import tempfile
+import threading
+import unittest
+
+location = pathlib.Path(__file__).parent.resolve()
+script = "{}/../../scripts/isar-image-convert".format(location)
+
+BLOCK = 4096
+
+
+class TestIsarImageConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.image = os.path.join(self.tmpdir.name, "image.ext4")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_image(self) -> bytes:
+        # data in blocks 0-1 and 10, holes in between and at the end
+        with open(self.image, "wb") as f:
+            f.write(b"a" * 2 * BLOCK)
+            f.seek(10 * BLOCK)
+            f.write(b"b" * BLOCK)
+            f.truncate(16 * BLOCK)
+        with open(self.image, "rb") as f:
+            return f.read()
+
+    def run_convert(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run([script, self.image] + list(args),
+                              stderr=subprocess.PIPE)
+
+    def test_outputs(self):
+        data = self.write_image()
+        result = self.run_convert("--filter", "gz", "gzip -c", "--sha256")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with gzip.open(self.image + ".gz") as f:
+            self.assertEqual(f.read(), data)
+        with open(self.image + ".sha256") as f:
+            self.assertEqual(f.read(), "%s  image.ext4\n"
+                             % hashlib.sha256(data).hexdigest())
+
+    def test_bmap(self):
+        data = self.write_image()
+        result = self.run_convert("--bmap")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open(self.image + ".bmap") as f:
+            bmap = f.read()
+        block_size = int(re.search(r"<BlockSize> (\d+) ", bmap).group(1))
+        self.assertEqual(int(re.search(r"<ImageSize> (\d+) ", bmap).group(1)),
+                         len(data))
+
+        ranges = re.findall(r'chksum="(\w+)"> ([\d-]+) ', bmap)
+        mapped = set()
+        for checksum, blocks in ranges:
+            first, _, last = blocks.partition("-")
+            first, last = int(first), int(last or first)
+            mapped.update(range(first * block_size, (last + 1) * block_size))
+            self.assertEqual(checksum, hashlib.sha256(
+                data[first * block_size:(last + 1) * block_size]).hexdigest())
+        # all data is mapped, the trailing hole is not
+        self.assertTrue(all(i in mapped for i, c in enumerate(data) if c))
+        self.assertNotIn(len(data) - 1, mapped)
+
+        # checked like bmaptool does, with the checksum replaced by zeros
+        checksum = re.search(r"<BmapFileChecksum> (\w+) ", bmap).group(1)
+        self.assertEqual(checksum, hashlib.sha256(
+            bmap.replace(checksum, "0" * 64, 1).encode()).hexdigest())
+
+    def test_filter_fails(self):
+        self.write_image()
+        result = self.run_convert("--filter", "gz", "false", "--sha256")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(b"'false' failed", result.stderr)
+
+    def test_follow(self):
+        marker = os.path.join(self.tmpdir.name, "written")
+        chunks = [os.urandom(100000) for _ in range(5)]
+
+        def write():
+            with open(self.image, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    f.flush()
+            open(marker, "w").close()
+
+        writer = threading.Timer(0.2, write)
+        writer.start()
+        result = self.run_convert("--follow", str(os.getpid()), marker,
+                                  "--filter", "gz", "gzip -c", "--sha256")
+        writer.join()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with gzip.open(self.image + ".gz") as f:
+            self.assertEqual(f.read(), b"".join(chunks))
+        with open(self.image + ".sha256") as f:
+            self.assertEqual(f.read().split()[0],
+                             hashlib.sha256(b"".join(chunks)).hexdigest())
+
+    def test_follow_writer_fails(self):
+        marker = os.path.join(self.tmpdir.name, "written")
+        writer = subprocess.Popen(["true"])
+        writer.wait()
+        result = self.run_convert("--follow", str(writer.pid), marker,
+                                  "--sha256")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(b"writer exited before completing the image",
+                      result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
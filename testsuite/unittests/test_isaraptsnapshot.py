@@ -0,0 +1,145 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+
+location = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, "{}/../../bitbake/lib".format(location))
+sys.path.insert(0, "{}/../../meta/lib".format(location))
+
+import isaraptsnapshot
+
+
+class TestIsarAptSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self.tmpdir.name, "repo")
+        self.snapshots = os.path.join(self.tmpdir.name, "snapshots")
+        self.debs = {}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def deploy(self, name, content):
+        """Replace the package 'name' like reprepro does"""
+        path = "pool/main/{0}/{1}/{1}_1.0_amd64.deb".format(name[0], name)
+        full = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        if os.path.exists(full):
+            os.remove(full)
+        with open(full, "wb") as f:
+            f.write(content)
+        self.debs[name] = (path, hashlib.sha256(content).hexdigest())
+        self.export()
+
+    def remove(self, name):
+        os.remove(os.path.join(self.repo, self.debs.pop(name)[0]))
+        self.export()
+
+    def export(self):
+        index = os.path.join(self.repo, "dists/bookworm/main/binary-amd64")
+        os.makedirs(index, exist_ok=True)
+        with open(os.path.join(index, "Packages"), "w") as f:
+            for name, (path, sha) in sorted(self.debs.items()):
+                f.write("Package: {}\nFilename: {}\nSHA256: {}\n\n"
+                        .format(name, path, sha))
+        dsc = os.path.join(self.repo, "pool/main/h/hello/hello_1.0.dsc")
+        os.makedirs(os.path.dirname(dsc), exist_ok=True)
+        with open(dsc, "w") as f:
+            f.write("hello")
+        sources = os.path.join(self.repo, "dists/bookworm/main/source")
+        os.makedirs(sources, exist_ok=True)
+        with open(os.path.join(sources, "Sources"), "w") as f:
+            f.write("Package: hello\nDirectory: pool/main/h/hello\n"
+                    "Checksums-Sha256:\n {} 5 hello_1.0.dsc\n\n"
+                    .format(hashlib.sha256(b"hello").hexdigest()))
+
+    def test_pool_files(self):
+        self.deploy("hello", b"hello")
+        files = isaraptsnapshot.pool_files(os.path.join(self.repo, "dists"))
+        self.assertEqual(files, {
+            "pool/main/h/hello/hello_1.0_amd64.deb":
+                hashlib.sha256(b"hello").hexdigest(),
+            "pool/main/h/hello/hello_1.0.dsc":
+                hashlib.sha256(b"hello").hexdigest(),
+        })
+
+    def test_store_is_shared(self):
+        self.deploy("hello", b"hello")
+        store = isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        deb = os.path.join(store, "main/h/hello/hello_1.0_amd64.deb")
+        inode = os.stat(deb).st_ino
+
+        self.deploy("world", b"world")
+        self.assertEqual(isaraptsnapshot.pool_store(self.repo, self.snapshots),
+                         store)
+        # existing files are not linked again
+        self.assertEqual(os.stat(deb).st_ino, inode)
+        self.assertTrue(os.path.exists(
+            os.path.join(store, "main/w/world/world_1.0_amd64.deb")))
+
+        # removed files stay available for older snapshots
+        self.remove("world")
+        self.assertEqual(isaraptsnapshot.pool_store(self.repo, self.snapshots),
+                         store)
+        self.assertTrue(os.path.exists(
+            os.path.join(store, "main/w/world/world_1.0_amd64.deb")))
+
+    def test_replaced_file(self):
+        self.deploy("hello", b"hello")
+        old = isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        self.deploy("hello", b"rebuilt")
+        new = isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        self.assertNotEqual(old, new)
+        for store, content in ((old, b"hello"), (new, b"rebuilt")):
+            with open(os.path.join(store, "main/h/hello/hello_1.0_amd64.deb"),
+                      "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def snapshot(self, name, store):
+        snapshot = os.path.join(self.snapshots, name)
+        os.makedirs(os.path.join(snapshot, "pool"))
+        os.symlink(os.path.join(self.repo, "dists"),
+                   os.path.join(snapshot, "dists"))
+        os.symlink(store, os.path.join(snapshot, isaraptsnapshot.STORE_LINK))
+        return snapshot
+
+    def test_cleanup(self):
+        self.deploy("hello", b"hello")
+        old = isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        first = self.snapshot("first", old)
+        self.deploy("hello", b"rebuilt")
+        self.deploy("world", b"world")
+        store = isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        self.assertTrue(os.path.exists(
+            os.path.join(store, "main/w/world/world_1.0_amd64.deb")))
+        self.remove("world")
+        isaraptsnapshot.pool_store(self.repo, self.snapshots)
+        latest = self.snapshot("latest", store)
+        os.utime(first, (1000, 1000))
+
+        isaraptsnapshot.cleanup(self.snapshots)
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(latest))
+        # files the latest snapshot does not refer to are removed
+        self.assertTrue(os.path.exists(
+            os.path.join(store, "main/h/hello/hello_1.0_amd64.deb")))
+        self.assertFalse(os.path.exists(
+            os.path.join(store, "main/w/world/world_1.0_amd64.deb")))
+        with open(store + ".json") as f:
+            self.assertNotIn("pool/main/w/world/world_1.0_amd64.deb",
+                             json.load(f))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+from bitbake import load_function, DataSmart
+
+import unittest
+
+
+file_name = "meta/classes/rootfs.bbclass"
+rootfs_paths_overlap = load_function(file_name, "rootfs_paths_overlap")
+rootfs_postprocess_plan = load_function(file_name, "rootfs_postprocess_plan")
+# functions are loaded into separate namespaces
+rootfs_postprocess_plan.__globals__["rootfs_paths_overlap"] = rootfs_paths_overlap
+
+
+class TestRootfsPathsOverlap(unittest.TestCase):
+
+    def test_same_path(self):
+        self.assertTrue(rootfs_paths_overlap(["/etc"], ["/etc"]))
+
+    def test_nested_paths(self):
+        self.assertTrue(rootfs_paths_overlap(["/etc"], ["/etc/passwd"]))
+        self.assertTrue(rootfs_paths_overlap(["/etc/passwd"], ["/etc/"]))
+        self.assertTrue(rootfs_paths_overlap(["/usr"], ["/"]))
+
+    def test_common_prefix(self):
+        self.assertFalse(rootfs_paths_overlap(["/etc"], ["/etcd"]))
+        self.assertFalse(rootfs_paths_overlap(["/usr/lib"], ["/usr/lib64"]))
+
+    def test_empty(self):
+        self.assertFalse(rootfs_paths_overlap([], ["/"]))
+        self.assertFalse(rootfs_paths_overlap(["/"], []))
+
+
+class TestRootfsPostprocessPlan(unittest.TestCase):
+
+    def setup(self, **flags) -> DataSmart:
+        d = DataSmart()
+        for cmd, cmd_flags in flags.items():
+            for flag, value in cmd_flags.items():
+                d.setVarFlag(cmd, "rootfs-" + flag, value)
+        return d
+
+    def test_disjoint_commands_do_not_wait(self):
+        d = self.setup(a={"writes": "/etc/hostname"},
+                       b={"writes": "/usr/share/doc"})
+        steps = rootfs_postprocess_plan(["a", "b"], d)
+        self.assertEqual([s["cmd"] for s in steps], ["a", "b"])
+        self.assertEqual(steps[1]["deps"], set())
+
+    def test_overlapping_commands_keep_order(self):
+        d = self.setup(a={"writes": "/etc"},
+                       b={"reads": "/etc/passwd"},
+                       c={"writes": "/etc/passwd"},
+                       d={"reads": "/etc/group"})
+        steps = rootfs_postprocess_plan(["a", "b", "c", "d"], d)
+        # read after write
+        self.assertEqual(steps[1]["deps"], {0})
+        # write after read and write
+        self.assertEqual(steps[2]["deps"], {0, 1})
+        # reads of different files do not wait for each other
+        self.assertEqual(steps[3]["deps"], {0})
+
+    def test_unflagged_command_is_a_barrier(self):
+        d = self.setup(a={"writes": "/etc/hostname"},
+                       c={"reads": "/usr/lib"})
+        steps = rootfs_postprocess_plan(["a", "b", "c"], d)
+        self.assertEqual(steps[1]["writes"], ["/"])
+        self.assertEqual(steps[1]["deps"], {0})
+        self.assertEqual(steps[2]["deps"], {1})
+
+    def test_walk_is_shared(self):
+        d = self.setup(a={"walk": "/usr", "writes": "/usr/lib/a"},
+                       b={"writes": "/etc/hostname"},
+                       c={"walk": "/usr/share", "writes": "/usr/share/c"})
+        steps = rootfs_postprocess_plan(["a", "b", "c"], d)
+        self.assertEqual([s["cmd"] for s in steps], [None, "a", "b", "c"])
+        self.assertEqual(steps[0]["roots"], ["/usr", "/usr/share"])
+        self.assertEqual(steps[1]["walk"], 0)
+        self.assertEqual(steps[3]["walk"], 0)
+        self.assertIn(0, steps[3]["deps"])
+        # c writes to the tree which a walks
+        self.assertIn(1, steps[3]["deps"])
+
+    def test_walk_after_write_to_tree(self):
+        d = self.setup(a={"walk": "/usr", "reads": "/usr"},
+                       b={"writes": "/usr/lib"},
+                       c={"walk": "/usr", "reads": "/usr"})
+        steps = rootfs_postprocess_plan(["a", "b", "c"], d)
+        self.assertEqual([s["cmd"] for s in steps],
+                         [None, "a", "b", None, "c"])
+        self.assertEqual(steps[4]["walk"], 3)
+        # the new walk sees the changes of b
+        self.assertEqual(steps[3]["deps"], {2})
+        self.assertEqual(steps[4]["deps"], {2, 3})
+
+    def test_walk_after_unflagged_command(self):
+        d = self.setup(a={"walk": "/var", "reads": "/var"},
+                       c={"walk": "/var", "reads": "/var"})
+        steps = rootfs_postprocess_plan(["a", "b", "c"], d)
+        self.assertEqual([s["cmd"] for s in steps],
+                         [None, "a", "b", None, "c"])
+        self.assertEqual(steps[3]["deps"], {2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# This software is a part of ISAR.
+# Copyright (C) Siemens AG, 2026
+#
+# SPDX-License-Identifier: MIT
+
+from rootfs import TemporaryRootfs
+
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+location = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, "{}/../../meta/lib".format(location))
+
+import rootfswalk
+
+
+class TestRootfswalk(unittest.TestCase):
+
+    def setup(self) -> TemporaryRootfs:
+        rootfs = TemporaryRootfs()
+        rootfs.create_file("/etc/hostname", "isar")
+        rootfs.create_file("/usr/bin/true", "")
+        os.symlink("/nonexistent", rootfs.path() + "/etc/dangling")
+        return rootfs
+
+    def run_walk(self, *args) -> list:
+        output = subprocess.run(
+            [sys.executable, rootfswalk.__file__] + list(args),
+            stdout=subprocess.PIPE, check=True).stdout
+        self.assertTrue(output == b"" or output.endswith(b"\0"))
+        return [tuple(r.decode().split(" ", 2))
+                for r in output.split(b"\0")[:-1]]
+
+    def test_walk_order(self):
+        rootfs = self.setup()
+        paths = [os.path.relpath(path, rootfs.path())
+                 for path, _ in rootfswalk.walk(rootfs.path())]
+        self.assertEqual(sorted(paths),
+                         sorted([".", "etc", "etc/hostname", "etc/dangling",
+                                 "usr", "usr/bin", "usr/bin/true"]))
+        # directories come after their contents
+        for i, path in enumerate(paths):
+            self.assertFalse(any(p.startswith(path + "/") or path == "."
+                                 for p in paths[i + 1:]))
+
+    def test_no_options(self):
+        rootfs = self.setup()
+        self.assertEqual(self.run_walk(rootfs.path()), [])
+
+    def test_clamp(self):
+        rootfs = self.setup()
+        os.utime(rootfs.path() + "/etc/dangling", (3000, 3000),
+                 follow_symlinks=False)
+        os.utime(rootfs.path() + "/usr/bin/true", (500, 500))
+        records = self.run_walk("--clamp", "1000", rootfs.path())
+        clamped = {path for kind, _, path in records if kind == "clamped"}
+        self.assertIn(("clamped", "l", rootfs.path() + "/etc/dangling"),
+                      records)
+        self.assertIn(("clamped", "f", rootfs.path() + "/etc/hostname"),
+                      records)
+        self.assertNotIn(rootfs.path() + "/usr/bin/true", clamped)
+        for path, st in rootfswalk.walk(rootfs.path()):
+            self.assertLessEqual(st.st_mtime, 1000, path)
+
+    def test_newer(self):
+        rootfs = self.setup()
+        stamps = TemporaryRootfs()
+        stamps.create_file("/stamp", "")
+        stamp = stamps.path() + "/stamp"
+        os.utime(stamp, (2000, 2000))
+        os.utime(rootfs.path() + "/usr/bin/true", (1000, 1000))
+        records = self.run_walk("--newer", stamp, rootfs.path())
+        self.assertEqual(records,
+                         [("newer", "f", rootfs.path() + "/etc/hostname")])
+
+    def test_cores(self):
+        rootfs = self.setup()
+        rootfs.create_file("/usr/bin/true.core", "core")
+        with tempfile.TemporaryDirectory() as cores:
+            records = self.run_walk("--cores", cores, "--clamp", "1000",
+                                    rootfs.path())
+            self.assertIn(("core", "f", rootfs.path() + "/usr/bin/true.core"),
+                          records)
+            self.assertTrue(os.path.exists(cores + "/true.core"))
+        self.assertFalse(os.path.exists(rootfs.path() + "/usr/bin/true.core"))
+        # the directory was clamped after the core was moved out of it
+        self.assertEqual(os.lstat(rootfs.path() + "/usr/bin").st_mtime, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()